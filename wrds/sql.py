@@ -1,11 +1,19 @@
 # -*- coding: utf-8 -*-
+import concurrent.futures
+import functools
 import getpass
+import hashlib
+import io
+import json
 import os
+import re
 import sys
 import stat
+import tempfile
+import threading
+import time
 import pandas as pd
 import sqlalchemy as sa
-import urllib.parse
 from wrds import __version__ as wrds_version
 
 from sys import version_info
@@ -31,6 +39,145 @@ WRDS_POSTGRES_DB = 'wrds'
 WRDS_CONNECT_ARGS = {'sslmode': 'require',
                      'application_name': appname
                      }
+# Pool for connections checked out per query (streamed, COPY and parallel
+#  pulls). Pre-ping and recycle replace stale ones at checkout, which
+#  the session connection, held for the Connection's lifetime, never is.
+WRDS_POOL_SIZE = 5
+WRDS_MAX_OVERFLOW = 5
+WRDS_POOL_RECYCLE = 3600
+# Library metadata rarely changes, so keep it on disk for a day.
+WRDS_SCHEMA_CACHE_FILE = '.wrds_schema_cache.json'
+WRDS_SCHEMA_CACHE_TTL = 24 * 60 * 60
+# Row counts are estimates anyway, so reuse them for an hour.
+WRDS_ROW_COUNT_TTL = 60 * 60
+# Query results are only cached on disk when a cache directory is given.
+WRDS_RESULT_CACHE_TTL = 24 * 60 * 60
+# Cached get_table pulls remembered per table, for answering later subsets.
+WRDS_PULL_CACHE_ENTRIES = 8
+
+# .pgpass fields are separated by colons not escaped with a backslash.
+_PGPASS_SPLIT = re.compile(r'(?<!\\):')
+
+
+# Schemata the user has permission to access (c.f. SAS LIBNAMEs)
+_SCHEMA_PERM_QUERY = sa.text("""
+WITH pgobjs AS (
+    -- objects we care about - tables, views, foreign tables, partitioned tables
+    SELECT oid, relnamespace, relkind
+    FROM pg_class
+    WHERE relkind = ANY (ARRAY['r'::"char", 'v'::"char", 'f'::"char", 'p'::"char"])
+),
+schemas AS (
+    -- schemas we have usage on that represent products
+    SELECT nspname AS schemaname, pg_namespace.oid, array_agg(DISTINCT relkind) AS relkind_a
+    FROM pg_namespace
+    JOIN pgobjs ON pg_namespace.oid = relnamespace
+    WHERE nspname !~ '(^pg_)|(_old$)|(_new$)|(information_schema)'
+        AND has_schema_privilege(nspname, 'USAGE') = TRUE
+    GROUP BY nspname, pg_namespace.oid
+)
+SELECT schemaname
+FROM schemas
+WHERE relkind_a != ARRAY['v'::"char"] -- any schema except only views
+UNION
+-- schemas w/ views (aka "friendly names") that reference accessable product tables
+SELECT nv.schemaname
+FROM schemas nv
+JOIN pgobjs v ON nv.oid = v.relnamespace AND v.relkind = 'v'::"char"
+JOIN pg_depend dv ON v.oid = dv.refobjid AND dv.refclassid = 'pg_class'::regclass::oid
+    AND dv.classid = 'pg_rewrite'::regclass::oid AND dv.deptype = 'i'::"char"
+JOIN pg_depend dt ON dv.objid = dt.objid AND dv.refobjid <> dt.refobjid
+    AND dt.classid = 'pg_rewrite'::regclass::oid AND dt.refclassid = 'pg_class'::regclass::oid
+JOIN pgobjs t ON dt.refobjid = t.oid
+    AND (t.relkind = ANY (ARRAY['r'::"char", 'v'::"char", 'f'::"char", 'p'::"char"]))
+JOIN schemas nt ON t.relnamespace = nt.oid
+GROUP BY nv.schemaname
+ORDER BY 1;
+""")
+
+# Source schema of every view in a schema
+_VIEW_SCHEMA_QUERY = sa.text("""
+SELECT DISTINCT dependent_view.relname AS view_name,
+       source_ns.nspname AS source_schema
+FROM pg_depend
+JOIN pg_rewrite
+  ON pg_depend.objid = pg_rewrite.oid
+JOIN pg_class as dependent_view
+  ON pg_rewrite.ev_class = dependent_view.oid
+JOIN pg_class as source_table
+  ON pg_depend.refobjid = source_table.oid
+JOIN pg_attribute
+  ON pg_depend.refobjid = pg_attribute.attrelid
+    AND pg_depend.refobjsubid = pg_attribute.attnum
+JOIN pg_namespace dependent_ns
+  ON dependent_ns.oid = dependent_view.relnamespace
+JOIN pg_namespace source_ns
+  ON source_ns.oid = source_table.relnamespace
+WHERE dependent_ns.nspname = :schema
+ORDER BY 1, 2;
+""")
+
+# Views, tables, materialized views and foreign tables in a schema
+_TABLES_QUERY = sa.text("""
+SELECT c.relname
+FROM pg_class c
+JOIN pg_namespace n ON c.relnamespace = n.oid
+WHERE n.nspname = :schema
+  AND c.relkind IN ('r', 'v', 'm', 'f', 'p')
+ORDER BY c.relname;
+""")
+
+# Columns of every relation in a schema
+_COLUMNS_QUERY = sa.text("""
+SELECT c.relname AS table_name,
+       a.attname AS name,
+       NOT a.attnotnull AS nullable,
+       format_type(a.atttypid, a.atttypmod) AS type,
+       col_description(c.oid, a.attnum) AS comment
+FROM pg_attribute a
+JOIN pg_class c ON a.attrelid = c.oid
+JOIN pg_namespace n ON c.relnamespace = n.oid
+WHERE n.nspname = :schema
+  AND c.relkind IN ('r', 'v', 'm', 'f', 'p')
+  AND a.attnum > 0
+  AND NOT a.attisdropped
+ORDER BY c.relname, a.attnum;
+""")
+
+# Planner row estimate of a table
+_ROW_COUNT_QUERY = sa.text("""
+SELECT r.reltuples::bigint
+FROM pg_class r
+JOIN pg_namespace n ON r.relnamespace = n.oid
+WHERE r.relkind IN ('r', 'p', 'm')
+  AND n.nspname = :schema
+  AND r.relname = :table;
+""")
+
+# Pages of storage of a table, for splitting it into ctid ranges
+_TABLE_PAGES_QUERY = sa.text("""
+SELECT pg_relation_size(r.oid) / current_setting('block_size')::int
+FROM pg_class r
+JOIN pg_namespace n ON r.relnamespace = n.oid
+WHERE r.relkind IN ('r', 'm')
+  AND n.nspname = :schema
+  AND r.relname = :table;
+""")
+
+
+@functools.lru_cache(maxsize=256)
+def _get_table_select(library, table, columns):
+    """
+    SELECT statement for get_table(), built once per query shape.
+
+    SQLAlchemy renders LIMIT and OFFSET as bound parameters,
+      so the compiled form is then shared by every obs and offset too.
+    """
+    if columns is None:
+        cols = [sa.literal_column('*')]
+    else:
+        cols = [sa.column(c) for c in columns]
+    return sa.select(*cols).select_from(sa.table(table, schema=library))
 
 
 class NotSubscribedError(PermissionError):
@@ -46,26 +193,34 @@ class Connection(object):
         """
         Set up the connection to the WRDS database.
         By default, also establish the connection to the database.
+        Otherwise it is established by the first query.
 
         Optionally, the user may specify connection parameters:
             *wrds_hostname*: WRDS database hostname
             *wrds_port*: database connection port number
             *wrds_dbname*: WRDS database name
             *wrds_username*: WRDS username
+            *wrds_pool_size*: connections kept in the engine pool
+            *wrds_max_overflow*: extra connections allowed beyond the pool
+            *wrds_schema_cache_ttl*: seconds to keep the on-disk
+              library list cache, 0 disables it (default: 24 hours)
+            *wrds_cache_dir*: directory to cache query results in
+              as Parquet files, needs pyarrow or fastparquet (default: None)
+            *wrds_cache_ttl*: seconds to keep cached query results
+              (default: 24 hours)
 
         The constructor will use the .pgpass file if it exists.
         If not, it will ask the user for a username and password.
         It will also direct the user to information on setting up .pgpass.
 
-        Additionally, creating the instance will load a list of schemas
-          the user has permission to access.
+        The list of schemas the user has permission to access
+          is loaded on first use, from ~/.wrds_schema_cache.json
+          if a fresh copy is cached there.
 
         :return: None
 
         Usage::
         >>> db = wrds.Connection()
-        Loading library list...
-        Done
         """
         self._password = kwargs.get('wrds_password', None)
         # If user passed in any of these parameters, override defaults.
@@ -74,6 +229,33 @@ class Connection(object):
         self._port = kwargs.get('wrds_port', WRDS_POSTGRES_PORT)
         self._dbname = kwargs.get('wrds_dbname', WRDS_POSTGRES_DB)
         self._connect_args = kwargs.get('wrds_connect_args', WRDS_CONNECT_ARGS)
+        self._schema_cache_ttl = kwargs.get('wrds_schema_cache_ttl',
+                                            WRDS_SCHEMA_CACHE_TTL)
+        self._cache_dir = kwargs.get('wrds_cache_dir', None)
+        self._cache_ttl = kwargs.get('wrds_cache_ttl', WRDS_RESULT_CACHE_TTL)
+        self._pull_cache_index = {}
+        self._schema_perm = None
+        self._all_schemas = None
+        self._schemas_from_cache = False
+        self._insp = None
+        self._tables_cache = {}
+        self._col_cache = {}
+        self._row_count_cache = {}
+        self._view_schema_cache = {}
+        self.connection = None
+        self._engine_kwargs = dict(
+            isolation_level="AUTOCOMMIT",
+            connect_args=self._connect_args,
+            pool_pre_ping=True,
+            pool_size=kwargs.get('wrds_pool_size', WRDS_POOL_SIZE),
+            max_overflow=kwargs.get('wrds_max_overflow', WRDS_MAX_OVERFLOW),
+            pool_recycle=WRDS_POOL_RECYCLE)
+        # Pooled checkouts allowed at once across all threads, leaving one
+        #  for the session connection, so nested parallel pulls queue here
+        #  instead of timing out waiting for the pool.
+        self._pool_slots = threading.BoundedSemaphore(max(
+            1, self._engine_kwargs['pool_size'] +
+            self._engine_kwargs['max_overflow'] - 1))
 
         # If username was passed in, the URI is different.
         if (self._username):
@@ -84,8 +266,7 @@ class Connection(object):
                     host=self._hostname,
                     port=self._port,
                     dbname=self._dbname),
-                isolation_level="AUTOCOMMIT",
-                connect_args=self._connect_args)
+                **self._engine_kwargs)
         # No username passed in, but other parameters might have been.
         else:
             pguri = 'postgresql://{host}:{port}/{dbname}'
@@ -94,31 +275,26 @@ class Connection(object):
                     host=self._hostname,
                     port=self._port,
                     dbname=self._dbname),
-                isolation_level="AUTOCOMMIT",
-                connect_args=self._connect_args)
+                **self._engine_kwargs)
         if (autoconnect):
             self.connect()
-            self.load_library_list()
 
     def connect(self):
         """ Make a connection to the WRDS database. """
+        # The inspector is bound to the connection being replaced.
+        self._insp = None
         try:
             self.connection = self.engine.connect()
-        except Exception as e:
-            print(self._username)
+        except sa.exc.OperationalError:
             # These things should probably not be exported all over creation
             if self._password is None or self._username is None:
                 self._username, self._password = self.__get_user_credentials()
-            pghost = 'postgresql://{usr}:{pwd}@{host}:{port}/{dbname}'
-            self.engine = sa.create_engine(
-                pghost.format(
-                    usr=self._username,
-                    pwd=urllib.parse.quote_plus(self._password),
-                    host=self._hostname,
-                    port=self._port,
-                    dbname=self._dbname),
-                isolation_level="AUTOCOMMIT",
-                connect_args=self._connect_args)
+            # Same URL with the credentials filled in; URL.set() escapes them.
+            # Dispose of the old pool rather than leave it behind.
+            url = self.engine.url.set(username=self._username,
+                                      password=self._password)
+            self.engine.dispose()
+            self.engine = sa.create_engine(url, **self._engine_kwargs)
             try:
                 self.connection = self.engine.connect()
             except Exception as e:
@@ -147,59 +323,130 @@ class Connection(object):
         """
             Close the connection to the database.
         """
-        self.connection.close()
+        if self.connection is not None:
+            self.connection.close()
+        # Forget the closed connection so the next query reconnects.
+        self.connection = None
+        self._insp = None
         self.engine.dispose()
 
     def __enter__(self):
-        self.connect()
+        self.__ensure_connected()
         return self
 
     def __exit__(self, *args):
         self.close()
 
+    def __ensure_connected(self):
+        """ Connect on first use if the connection was not made up front. """
+        if self.connection is None:
+            self.connect()
+
+    @property
+    def insp(self):
+        """ SQLAlchemy inspector for the connection, created on first use. """
+        if self._insp is None:
+            self.__ensure_connected()
+            self._insp = sa.inspect(self.connection)
+        return self._insp
+
+    @property
+    def schema_perm(self):
+        """ List of schemata the user has permission to access.
+
+            Loaded on first access, from the on-disk cache if it is fresh,
+              otherwise from the database.
+            Returns a copy, so callers cannot change the cached list.
+        """
+        if self._schema_perm is None:
+            self._schema_perm = self.__read_schema_cache('schemas')
+            self._schemas_from_cache = self._schema_perm is not None
+        if self._schema_perm is None:
+            self.load_library_list()
+        return list(self._schema_perm)
+
     def load_library_list(self):
         """ Load the list of Postgres schemata (c.f. SAS LIBNAMEs)
-              the user has permission to access. """
-        self.insp = sa.inspect(self.connection)
-        print("Loading library list...")
-        query = """
-WITH pgobjs AS (
-    -- objects we care about - tables, views, foreign tables, partitioned tables
-    SELECT oid, relnamespace, relkind
-    FROM pg_class
-    WHERE relkind = ANY (ARRAY['r'::"char", 'v'::"char", 'f'::"char", 'p'::"char"])
-),
-schemas AS (
-    -- schemas we have usage on that represent products
-    SELECT nspname AS schemaname, pg_namespace.oid, array_agg(DISTINCT relkind) AS relkind_a
-    FROM pg_namespace
-    JOIN pgobjs ON pg_namespace.oid = relnamespace
-    WHERE nspname !~ '(^pg_)|(_old$)|(_new$)|(information_schema)'
-        AND has_schema_privilege(nspname, 'USAGE') = TRUE
-    GROUP BY nspname, pg_namespace.oid
-)
-SELECT schemaname
-FROM schemas
-WHERE relkind_a != ARRAY['v'::"char"] -- any schema except only views
-UNION
--- schemas w/ views (aka "friendly names") that reference accessable product tables
-SELECT nv.schemaname
-FROM schemas nv
-JOIN pgobjs v ON nv.oid = v.relnamespace AND v.relkind = 'v'::"char"
-JOIN pg_depend dv ON v.oid = dv.refobjid AND dv.refclassid = 'pg_class'::regclass::oid
-    AND dv.classid = 'pg_rewrite'::regclass::oid AND dv.deptype = 'i'::"char"
-JOIN pg_depend dt ON dv.objid = dt.objid AND dv.refobjid <> dt.refobjid
-    AND dt.classid = 'pg_rewrite'::regclass::oid AND dt.refclassid = 'pg_class'::regclass::oid
-JOIN pgobjs t ON dt.refobjid = t.oid
-    AND (t.relkind = ANY (ARRAY['r'::"char", 'v'::"char", 'f'::"char", 'p'::"char"]))
-JOIN schemas nt ON t.relnamespace = nt.oid
-GROUP BY nv.schemaname
-ORDER BY 1;
+              the user has permission to access.
+
+            Always queries the database and refreshes the on-disk cache.
         """
-        cursor = self.connection.execute(query)
-        self.schema_perm = [x[0] for x in cursor.fetchall()]
+        print("Loading library list...")
+        self.__ensure_connected()
+        cursor = self.connection.execute(_SCHEMA_PERM_QUERY)
+        # Suffix filtering is done by the query itself.
+        self._schema_perm = [row[0] for row in cursor]
+        self.__write_schema_cache('schemas', self._schema_perm)
         print("Done")
 
+    def __schema_cache_path(self):
+        """ Location of the on-disk library list cache. """
+        return os.path.join(os.path.expanduser('~'), WRDS_SCHEMA_CACHE_FILE)
+
+    def __schema_cache_profile(self):
+        """
+        Key identifying this connection in the cache file.
+
+        libpq falls back to the OS username if none is given,
+          so do the same here.
+        """
+        return '{usr}@{host}:{port}/{dbname}'.format(
+            usr=self._username or getpass.getuser(),
+            host=self._hostname,
+            port=self._port,
+            dbname=self._dbname)
+
+    def __load_schema_cache(self):
+        """ Read the whole cache file, or an empty dict if unusable. """
+        try:
+            with open(self.__schema_cache_path(), 'r') as fd:
+                cache = json.load(fd)
+        except (IOError, OSError, ValueError):
+            return {}
+        return cache if isinstance(cache, dict) else {}
+
+    def __read_schema_cache(self, key):
+        """
+        Return the cached value of key for this connection,
+          or None if it is missing, stale or caching is disabled.
+        """
+        if not self._schema_cache_ttl:
+            return None
+        profile = self.__load_schema_cache().get(self.__schema_cache_profile())
+        entry = (profile or {}).get(key)
+        try:
+            if time.time() - entry['ts'] < self._schema_cache_ttl:
+                return entry['value']
+        except (KeyError, TypeError):
+            pass
+        return None
+
+    def __write_schema_cache(self, key, value):
+        """
+        Store value under key for this connection in the cache file.
+
+        The file is replaced atomically and is only readable by the user,
+          like the .pgpass file.
+        A cache that cannot be written is not an error.
+        """
+        if not self._schema_cache_ttl:
+            return
+        cachefile = self.__schema_cache_path()
+        cache = self.__load_schema_cache()
+        profile = cache.setdefault(self.__schema_cache_profile(), {})
+        profile[key] = {'ts': time.time(), 'value': value}
+        try:
+            # mkstemp creates the file with mode 600 (rw-------)
+            fd, tmpfile = tempfile.mkstemp(dir=os.path.dirname(cachefile))
+        except (IOError, OSError):
+            return
+        try:
+            with os.fdopen(fd, 'w') as tmp:
+                json.dump(cache, tmp)
+            os.replace(tmpfile, cachefile)
+        except (IOError, OSError):
+            os.remove(tmpfile)
+
     def __get_user_credentials(self):
         """Prompt the user for their WRDS credentials.
 
@@ -294,60 +541,63 @@ ORDER BY 1;
 
         Works on both *nix and Win32.
         """
-        pgpass = "{host}:{port}:{dbname}:{user}:{passwd}\n"
+        prefix = "{host}:{port}:{dbname}:{user}:".format(
+            host=self._hostname,
+            port=self._port,
+            dbname=self._dbname,
+            user=self._username)
         passwd = self._password
-        passwd = passwd.replace(':', '\:')
+        passwd = passwd.replace(':', '\\:')
+        newline = prefix + passwd + '\n'
         # Avoid clobbering the file if it exists
         if (os.path.isfile(pgfile)):
-            with open(pgfile, 'r') as fd:
-                lines = fd.readlines()
-            newlines = []
-            for line in lines:
-                # Handle escaped colons, preventing
-                #  split() from splitting on them.
-                # Saving to a new variable here absolves us
-                #  of having to re-replace the substituted ##COLON## later.
-                oldline = line.replace("""\:""", '##COLON##')
-                fields = oldline.split(':')
-                # On finding a line matching the hostname, port and dbname
-                #  we replace it with the new pgpass line.
-                # Surely we won't have any colons in these fields :^)
-                if (fields[0] == self._hostname and
-                        int(fields[1]) == self._port and
-                        fields[2] == self._dbname and
-                        fields[3] == self._username):
-                    newline = pgpass.format(
-                        host=self._hostname,
-                        port=self._port,
-                        dbname=self._dbname,
-                        user=self._username,
-                        passwd=passwd)
-                    newlines.append(newline)
-                else:
-                    newlines.append(line)
-
-            # Add line for current user/password - enables multiple wrds-pgdata entries with
-            # different usernames
-            newline = pgpass.format(
-                host=self._hostname,
-                port=self._port,
-                dbname=self._dbname,
-                user=self._username,
-                passwd=passwd)
-            if newline not in newlines:
-                newlines.append(newline)
-            lines = newlines
+            # libpq uses the first entry matching host, port, dbname and user.
+            # If that entry already has this password there is nothing to do,
+            #  which a single scan of the raw file can tell us.
+            with open(pgfile, 'rb') as fd:
+                contents = b'\n' + fd.read()
+            start = contents.find(('\n' + prefix).encode())
+            if start >= 0:
+                end = contents.find(b'\n', start + 1)
+                entry = contents[start + 1:end if end >= 0 else None]
+                if entry.rstrip(b'\r') == newline.rstrip('\n').encode():
+                    return
+            # Stream the old file into a temporary one next to it,
+            #  then move that into place, so a failed write
+            #  never leaves a truncated .pgpass behind.
+            entry = [self._hostname, str(self._port), self._dbname, self._username]
+            fd, tmpfile = tempfile.mkstemp(
+                dir=os.path.dirname(os.path.abspath(pgfile)))
+            try:
+                # Wrap the descriptor first, so it is closed
+                #  even if the old file cannot be opened.
+                with os.fdopen(fd, 'w') as fout, open(pgfile, 'r') as fin:
+                    found = False
+                    line = ''
+                    for line in fin:
+                        # Split on unescaped colons only; the password,
+                        #  which may contain escaped ones, stays whole.
+                        fields = _PGPASS_SPLIT.split(line, maxsplit=4)
+                        # On finding a line matching the hostname, port,
+                        #  dbname and username we replace it with the new line.
+                        if fields[:4] == entry:
+                            fout.write(newline)
+                            found = True
+                        else:
+                            fout.write(line)
+                    # Add line for current user/password - enables multiple
+                    #  wrds-pgdata entries with different usernames
+                    if not found:
+                        if line and not line.endswith('\n'):
+                            fout.write('\n')
+                        fout.write(newline)
+                os.replace(tmpfile, pgfile)
+            except BaseException:
+                os.remove(tmpfile)
+                raise
         else:
-            line = pgpass.format(
-                host=self._hostname,
-                port=self._port,
-                dbname=self._dbname,
-                user=self._username,
-                passwd=passwd)
-            lines = [line]
-        # I lied, we're totally clobbering it:
-        with open(pgfile, 'w') as fd:
-            fd.writelines(lines)
+            with open(pgfile, 'w') as fd:
+                fd.write(newline)
 
     def __check_schema_perms(self, schema):
         """
@@ -357,6 +607,10 @@ ORDER BY 1;
 
             Else, return True
 
+            A library granted or created since the library lists
+              were cached on disk is not in them, so on a miss
+              they are reloaded from the database once before failing.
+
             :param schema: Postgres schema name.
             :rtype: bool
 
@@ -364,7 +618,14 @@ ORDER BY 1;
         if schema in self.schema_perm:
             return True
         else:
-            if schema in self.insp.get_schema_names():
+            all_schemas = self.__get_all_schemas()
+            if self._schemas_from_cache:
+                self._schemas_from_cache = False
+                self.load_library_list()
+                if schema in self._schema_perm:
+                    return True
+                all_schemas = self.__get_all_schemas(refresh=True)
+            if schema in all_schemas:
                 raise NotSubscribedError(
                     "You do not have permission to access "
                     "the {} library".format(schema))
@@ -372,6 +633,25 @@ ORDER BY 1;
                 raise SchemaNotFoundError(
                     "The {} library is not found.".format(schema))
 
+    def __get_all_schemas(self, refresh=False):
+        """
+        Internal function returning the names of all schemata,
+          including those the user has no permission to access.
+
+        Kept for the session and in the on-disk library list cache,
+          since it is only needed to explain a failed permission check.
+        With refresh, always queries the database.
+        """
+        if self._all_schemas is None or refresh:
+            schemas = None if refresh else self.__read_schema_cache('all_schemas')
+            if schemas is None:
+                schemas = self.insp.get_schema_names()
+                self.__write_schema_cache('all_schemas', schemas)
+            else:
+                self._schemas_from_cache = True
+            self._all_schemas = schemas
+        return self._all_schemas
+
     def list_libraries(self):
         """
             Return all the libraries (schemas) the user can access.
@@ -388,6 +668,9 @@ ORDER BY 1;
         """
             Returns a list of all the views/tables/foreign tables within a schema.
 
+            The list is kept for the session and in the on-disk
+              library list cache, and a copy of it is returned.
+
             :param library: Postgres schema name.
 
             :rtype: list
@@ -397,36 +680,58 @@ ORDER BY 1;
             ['wciklink_gvkey', 'dforms', 'wciklink_cusip', 'wrds_forms', ...]
         """
         if self.__check_schema_perms(library):
-            output = (self.insp.get_view_names(schema=library) +
-                      self.insp.get_table_names(schema=library) +
-                      self.insp.get_foreign_table_names(schema=library))
-            return output
+            if library not in self._tables_cache:
+                tables = self.__read_schema_cache('tables:' + library)
+                if tables is None:
+                    self.__ensure_connected()
+                    result = self.connection.execute(
+                        _TABLES_QUERY, {'schema': library})
+                    tables = [row[0] for row in result]
+                    self.__write_schema_cache('tables:' + library, tables)
+                self._tables_cache[library] = tables
+            return list(self._tables_cache[library])
 
     def __get_schema_for_view(self, schema, table):
         """
         Internal function for getting the schema based on a view
         """
-        sql_code = """SELECT distinct(source_ns.nspname) AS source_schema
-                      FROM pg_depend
-                      JOIN pg_rewrite
-                        ON pg_depend.objid = pg_rewrite.oid
-                      JOIN pg_class as dependent_view
-                        ON pg_rewrite.ev_class = dependent_view.oid
-                      JOIN pg_class as source_table
-                        ON pg_depend.refobjid = source_table.oid
-                      JOIN pg_attribute
-                        ON pg_depend.refobjid = pg_attribute.attrelid
-                          AND pg_depend.refobjsubid = pg_attribute.attnum
-                      JOIN pg_namespace dependent_ns
-                        ON dependent_ns.oid = dependent_view.relnamespace
-                      JOIN pg_namespace source_ns
-                        ON source_ns.oid = source_table.relnamespace
-                      WHERE dependent_ns.nspname = '{schema}'
-                        AND dependent_view.relname = '{view}';
-                    """.format(schema=schema, view=table)
         if self.__check_schema_perms(schema):
-            result = self.connection.execute(sql_code)
-            return result.fetchone()[0]
+            return self.__get_schema_for_views(schema).get(table)
+
+    def __get_schema_for_views(self, schema):
+        """
+        Internal function for getting the source schema of every view
+          in a schema, as a dict of view name to schema name.
+
+        All views are resolved with one query the first time a schema
+          is looked up, so later lookups are dict hits.
+        """
+        if schema not in self._view_schema_cache:
+            self.__ensure_connected()
+            result = self.connection.execute(
+                _VIEW_SCHEMA_QUERY, {'schema': schema})
+            views = {}
+            for view, source_schema in result.fetchall():
+                views.setdefault(view, source_schema)
+            self._view_schema_cache[schema] = views
+        return self._view_schema_cache[schema]
+
+    def __reflect_schema(self, library):
+        """
+        Internal function returning the columns of every table in a schema,
+          as a dict of table name to pandas.DataFrame.
+
+        All tables are loaded with one catalog query the first time
+          a schema is described, instead of reflecting them one by one.
+        """
+        if library not in self._col_cache:
+            self.__ensure_connected()
+            columns = pd.read_sql_query(_COLUMNS_QUERY, self.connection,
+                                        params={'schema': library})
+            self._col_cache[library] = {
+                name: group.drop(columns='table_name').reset_index(drop=True)
+                for name, group in columns.groupby('table_name')}
+        return self._col_cache[library]
 
     def describe_table(self, library, table):
         """
@@ -441,24 +746,29 @@ ORDER BY 1;
 
             Usage::
             >>> db.describe_table('wrdssec_all', 'dforms')
-                        name nullable     type comment
-                  0      cik     True  VARCHAR
-                  1    fdate     True     DATE
-                  2  secdate     True     DATE
-                  3     form     True  VARCHAR
-                  4   coname     True  VARCHAR
-                  5    fname     True  VARCHAR
+                        name nullable               type comment
+                  0      cik     True  character varying    None
+                  1    fdate     True               date    None
+                  2  secdate     True               date    None
+                  3     form     True  character varying    None
+                  4   coname     True  character varying    None
+                  5    fname     True  character varying    None
         """
         rows = self.get_row_count(library, table)
         print("Approximately {} rows in {}.{}.".format(rows, library, table))
-        table_info = pd.DataFrame.from_dict(
-            self.insp.get_columns(table, schema=library))
-        return table_info[['name', 'nullable', 'type', 'comment']]
+        table_info = self.__reflect_schema(library).get(table)
+        if table_info is None:
+            raise sa.exc.NoSuchTableError('{}.{}'.format(library, table))
+        return table_info.copy()
 
     def get_row_count(self, library, table):
         """
             Uses the library and table to get the approximate row count for the table.
 
+            Tables are looked up in the planner statistics,
+              views and tables without statistics are estimated by EXPLAIN.
+            Counts are reused for an hour.
+
             :param library: Postgres schema name.
             :param table: Postgres table name.
 
@@ -468,22 +778,38 @@ ORDER BY 1;
             >>> db.get_row_count('wrdssec', 'dforms')
             16378400
         """
-
-        sqlstmt = """
-            EXPLAIN (FORMAT 'json')  SELECT 1 FROM {}.{} ;
-        """.format(sa.sql.quoted_name(library, True), sa.sql.quoted_name(table, True))
+        key = (library.lower(), table.lower())
+        cached = self._row_count_cache.get(key)
+        if cached is not None and time.time() - cached[0] < WRDS_ROW_COUNT_TTL:
+            return cached[1]
 
         try:
-            result = self.connection.execute(sqlstmt)
-            return int(result.fetchone()[0][0]["Plan"]["Plan Rows"])
+            self.__ensure_connected()
+            result = self.connection.execute(
+                _ROW_COUNT_QUERY, {'schema': key[0], 'table': key[1]})
+            row = result.fetchone()
+            rows = row[0] if row is not None else None
+            # Not a table, or never analyzed (0, or -1 since Postgres 14)
+            if rows is None or rows <= 0:
+                # EXPLAIN cannot take bound identifiers, so quote them instead,
+                #  folding case the same way get_table does.
+                preparer = self.engine.dialect.identifier_preparer
+                sqlstmt = """
+                    EXPLAIN (FORMAT 'json')  SELECT 1 FROM {}.{} ;
+                """.format(preparer.quote_schema(key[0]),
+                           preparer.quote(key[1]))
+                result = self.connection.execute(sqlstmt)
+                rows = int(result.fetchone()[0][0]["Plan"]["Plan Rows"])
         except Exception as e:
             print(
                 "There was a problem with retrieving the row count: {}".format(e))
             return 0
+        self._row_count_cache[key] = (time.time(), rows)
+        return rows
 
 
     def raw_sql(self, sql, coerce_float=True, date_cols=None, index_col=None, params=None,
-        chunksize=500000, return_iter=False):
+        chunksize=500000, return_iter=False, stream=False):
         """
             Queries the database using a raw SQL string.
 
@@ -512,6 +838,21 @@ ORDER BY 1;
             :param return_iter: (optional) boolean, default:False
                 When chunksize is not None, return an iterator where chunksize
                 number of rows is included in each chunk.
+            :param stream: (optional) boolean, default: False
+                When chunksize is not None, stream the rows from a
+                server-side cursor on a separate pooled connection,
+                so at most one chunk of rows is held in memory before it
+                becomes a DataFrame. Only works for SELECT queries, and
+                temporary tables or settings made on db.connection
+                are not visible to the query.
+
+            If the connection was made with *wrds_cache_dir*, results
+              are also saved there and the same query with the same
+              arguments is read back from disk until *wrds_cache_ttl*.
+              Iterators are never cached.
+              get_table() additionally answers pulls of fewer columns
+              or rows than an earlier pull in the same session from
+              that pull's cached result.
 
             :rtype: pandas.DataFrame or or Iterator[pandas.DataFrame]
 
@@ -540,29 +881,114 @@ ORDER BY 1;
                 2003-09-10  09:35:20.709000  N       AA       None     None  108100.0  28.200          N      00  1.929947e+15         C  None
         """
 
-        try:
-
-            df = pd.read_sql_query(
-                sql,
-                self.connection,
-                coerce_float=coerce_float,
-                parse_dates=date_cols,
-                index_col=index_col,
-                chunksize=chunksize,
-                params=params)
-            if return_iter or chunksize is None:
+        cachefile = None
+        if self._cache_dir is not None and not return_iter:
+            cachefile = self.__result_cache_file(
+                sql, coerce_float, date_cols, index_col, params)
+            df = self.__read_result_cache(cachefile)
+            if df is not None:
                 return df
+
+        self.__ensure_connected()
+        try:
+            if stream and chunksize is not None:
+                df = self.__stream_sql(
+                    sql,
+                    coerce_float=coerce_float,
+                    parse_dates=date_cols,
+                    index_col=index_col,
+                    chunksize=chunksize,
+                    params=params)
             else:
-                full_df = pd.DataFrame()
-                for chunk in df:
-                    full_df = pd.concat([full_df, chunk])
-                return full_df
+                df = pd.read_sql_query(
+                    sql,
+                    self.connection,
+                    coerce_float=coerce_float,
+                    parse_dates=date_cols,
+                    index_col=index_col,
+                    chunksize=chunksize,
+                    params=params)
+            if chunksize is not None:
+                if return_iter:
+                    return df
+                # Concatenate once; growing a frame chunk by chunk is quadratic.
+                # Older pandas yields no chunks at all for an empty result.
+                chunks = list(df)
+                df = pd.concat(chunks) if chunks else pd.DataFrame()
         except sa.exc.ProgrammingError as e:
             raise e
 
+        if cachefile is not None:
+            self.__write_result_cache(df, cachefile)
+        return df
+
+    def __result_cache_file(self, sql, *args):
+        """
+        Internal function naming the cache file of a query result.
+
+        The name is a hash of the connection, the query with its whitespace
+          collapsed, and every other argument that shapes the result.
+        Case is kept, since it matters inside string literals.
+        """
+        if not isinstance(sql, str):
+            # SQLAlchemy statements, e.g. from get_table()
+            sql = str(sql.compile(dialect=self.engine.dialect,
+                                  compile_kwargs={'literal_binds': True}))
+        key = repr((self._username, self._hostname, self._port, self._dbname,
+                    re.sub(r'\s+', ' ', sql.strip())) + args)
+        digest = hashlib.blake2b(key.encode('utf-8')).hexdigest()
+        return os.path.join(os.path.expanduser(self._cache_dir),
+                            digest + '.parquet')
+
+    def __read_result_cache(self, cachefile, columns=None):
+        """ Return a cached result if present and fresh, else None. """
+        try:
+            if time.time() - os.path.getmtime(cachefile) >= self._cache_ttl:
+                return None
+            if columns is None:
+                return pd.read_parquet(cachefile)
+            return pd.read_parquet(cachefile, columns=list(columns))
+        except (IOError, OSError, ValueError):
+            return None
+
+    def __write_result_cache(self, df, cachefile):
+        """
+        Save a query result to the cache.
+
+        The file is written under a temporary name and renamed into place,
+          so readers never see a partial file.
+        Failing to cache is reported but does not lose the result,
+          whatever the Parquet engine raises, e.g. for column types
+          it cannot write.
+        """
+        tmpfile = cachefile + '.{}.tmp'.format(os.getpid())
+        try:
+            os.makedirs(os.path.dirname(cachefile), exist_ok=True)
+            df.to_parquet(tmpfile)
+            os.replace(tmpfile, cachefile)
+        except Exception as e:
+            print("Could not cache the query result: {}".format(e))
+            if os.path.exists(tmpfile):
+                os.remove(tmpfile)
+
+    def __stream_sql(self, sql, **kwargs):
+        """
+        Internal generator reading a query in chunks through a server-side
+          cursor, so the client never holds more than one chunk of rows.
+
+        psycopg2 only allows server-side cursors inside a transaction,
+          so the query runs on its own pooled connection taken out of
+          autocommit mode, leaving the session connection untouched.
+        """
+        with self.engine.connect() as conn:
+            conn = conn.execution_options(isolation_level='READ COMMITTED',
+                                          stream_results=True)
+            for chunk in pd.read_sql_query(sql, conn, **kwargs):
+                yield chunk
+
     def get_table(self, library, table, obs=-1, offset=0,
                   columns=None, coerce_float=None, index_col=None,
-                  date_cols=None):
+                  date_cols=None, method='sql', parallel=1, stream=None):
         """
             Creates a data frame from an entire table in the database.
 
@@ -577,6 +1003,7 @@ ORDER BY 1;
                 An offset of 0 will start selecting from the beginning.
             :param columns: (optional) list or tuple, default: None
                 Specifies the columns to be included in the output data frame.
+                Names are quoted, so reserved words such as 'order' work.
             :param coerce_float: (optional) boolean, default: True
                 Attempt to convert values to non-string, non-numeric objects
                 to floating point. Can result in loss of precision.
@@ -593,6 +1020,27 @@ ORDER BY 1;
             :param index_col: (optional) string or list of strings,
               default: None
                 Column(s) to set as index(MultiIndex)
+            :param method: (optional) 'sql' or 'copy', default: 'sql'
+                'copy' transfers the rows with COPY ... TO STDOUT as CSV,
+                which is much faster for large pulls of wide tables.
+                Text and boolean columns keep their types, others are
+                inferred by pandas, date_cols is used as a list of column names
+                and coerce_float is ignored.
+            :param parallel: (optional) int, default: 1
+                When pulling an entire table, split it into this many
+                ranges of its physical storage and pull them at once over
+                the connection pool. Rows come back in storage order.
+                Views, and tables too small to split, are pulled whole.
+                The ranges are read in separate transactions, so use this
+                only for tables that are not being modified.
+                All pulls, including those of get_tables(), share the
+                pool and wait for a free connection rather than overflow it.
+            :param stream: (optional) boolean, default: None
+                With method 'sql', stream the rows from a server-side
+                cursor on a pooled connection, see raw_sql(), instead of
+                reading them over the session connection.
+                By default only entire tables and parallel pulls
+                are streamed, since streaming opens a second connection.
 
             :rtype: pandas.DataFrame
 
@@ -608,23 +1056,236 @@ ORDER BY 1;
                 ...
 
         """
-        if obs < 0:
-            obsstmt = ''
-        else:
-            obsstmt = ' LIMIT {}'.format(obs)
-        if columns is None:
-            cols = '*'
-        else:
-            cols = ','.join(columns)
+        # Names are quoted so reserved words work as column names.
+        # Postgres folds unquoted names to lower case, so keep doing that
+        #  for callers passing e.g. SAS-style upper case names.
+        if columns is not None:
+            columns = tuple(c.lower() for c in columns)
         if self.__check_schema_perms(library):
-            sqlstmt = ('SELECT {cols} FROM {schema}.{table} {obsstmt} OFFSET {offset};'.format(
-                       cols=cols,
-                       schema=library,
-                       table=table,
-                       obsstmt=obsstmt,
-                       offset=offset))
-            return self.raw_sql(
-                sqlstmt,
-                coerce_float=coerce_float,
-                index_col=index_col,
-                date_cols=date_cols)
+            sqlstmt = _get_table_select(library, table.lower(), columns)
+            # Only limit and offset when asked to,
+            #  leaving full-table pulls free for the planner.
+            if obs >= 0:
+                sqlstmt = sqlstmt.limit(obs)
+            if offset > 0:
+                sqlstmt = sqlstmt.offset(offset)
+            if method == 'copy':
+                fetch = functools.partial(
+                    self.__copy_sql,
+                    library=library,
+                    table=table.lower(),
+                    index_col=index_col,
+                    date_cols=date_cols)
+            elif method == 'sql':
+                # Always a plain SELECT, so it can be streamed when large,
+                #  which also keeps parallel pulls off the session connection.
+                if stream is None:
+                    stream = obs < 0 or parallel > 1
+                fetch = functools.partial(
+                    self.raw_sql,
+                    coerce_float=coerce_float,
+                    index_col=index_col,
+                    date_cols=date_cols,
+                    stream=stream)
+            else:
+                raise ValueError(
+                    "method must be 'sql' or 'copy', not {!r}".format(method))
+
+            def pull(stmt):
+                if method == 'sql' and not stream:
+                    return fetch(stmt)
+                # Streamed and COPY pulls check out a pooled connection.
+                with self._pool_slots:
+                    return fetch(stmt)
+
+            # Pulls that a cached pull of the same table contains
+            #  are sliced out of it instead of queried again.
+            cacheable = (self._cache_dir is not None and method == 'sql' and
+                         index_col is None)
+            shape = (library, table.lower(), repr((coerce_float, date_cols)))
+            if cacheable:
+                df = self.__read_table_cache(shape, columns, obs, offset)
+                if df is not None:
+                    return df
+            if parallel > 1 and obs < 0 and offset == 0:
+                parts = self.__ctid_partitions(
+                    sqlstmt, library, table.lower(), parallel)
+                if parts:
+                    if method == 'copy':
+                        # Load the column types before the threads need them.
+                        self.__reflect_schema(library)
+                    max_workers = min(len(parts), self._engine_kwargs['pool_size'])
+                    with concurrent.futures.ThreadPoolExecutor(
+                            max_workers=max_workers) as ex:
+                        # Without index_col each range numbers its rows from 0,
+                        #  so number them again as a single pull would.
+                        return pd.concat(list(ex.map(pull, parts)),
+                                         ignore_index=index_col is None)
+            df = pull(sqlstmt)
+            if cacheable:
+                # Where raw_sql() cached the result
+                cachefile = self.__result_cache_file(
+                    sqlstmt, coerce_float, date_cols, index_col, None)
+                if os.path.isfile(cachefile):
+                    entries = self._pull_cache_index.setdefault(shape, [])
+                    # Newest first; the oldest pulls are forgotten.
+                    entries.insert(0, {
+                        'columns': columns,
+                        'offset': offset,
+                        # Fewer rows than asked for means the pull hit the end
+                        'complete': obs < 0 or len(df) < obs,
+                        'rows': len(df),
+                        'file': cachefile})
+                    del entries[WRDS_PULL_CACHE_ENTRIES:]
+            return df
+
+    def __read_table_cache(self, shape, columns, obs, offset):
+        """
+        Internal function answering a get_table() pull from an earlier
+          cached pull of the same table that contains it, or None.
+
+        A cached pull contains another if it has all of its columns
+          and its rows cover the requested offset and obs.
+        Like LIMIT and OFFSET themselves, this assumes rows come back
+          in the same order each time.
+        """
+        for entry in list(self._pull_cache_index.get(shape, ())):
+            if entry['offset'] > offset:
+                continue
+            if entry['columns'] is not None and (
+                    columns is None or
+                    not set(columns) <= set(entry['columns'])):
+                continue
+            start = offset - entry['offset']
+            if obs < 0:
+                if not entry['complete']:
+                    continue
+                stop = None
+            else:
+                stop = start + obs
+                if not entry['complete'] and stop > entry['rows']:
+                    continue
+            df = self.__read_result_cache(entry['file'], columns)
+            if df is None:
+                continue
+            return df.iloc[start:stop].reset_index(drop=True)
+        return None
+
+    def __ctid_partitions(self, sqlstmt, library, table, parts):
+        """
+        Internal function splitting a get_table() statement into parts
+          that each select one range of the table's pages by ctid.
+
+        Returns an empty list for views, which have no ctid,
+          and for tables with fewer pages than parts.
+        Runs on its own pooled connection, since get_tables()
+          may be calling it from several threads at once.
+        """
+        self.__ensure_connected()
+        with self._pool_slots, self.engine.connect() as conn:
+            row = conn.execute(
+                _TABLE_PAGES_QUERY, {'schema': library, 'table': table}
+            ).fetchone()
+        pages = row[0] if row is not None else 0
+        if pages < parts:
+            return []
+        step = -(-pages // parts)
+        starts = list(range(0, pages, step))
+        stmts = []
+        for i, start in enumerate(starts):
+            lower = '({},0)'.format(start)
+            if i + 1 < len(starts):
+                upper = '({},0)'.format(starts[i + 1])
+                where = sa.text(
+                    'ctid >= CAST(:lower AS tid) AND ctid < CAST(:upper AS tid)'
+                ).bindparams(lower=lower, upper=upper)
+            else:
+                # Open ended, in case the table grew since it was measured.
+                where = sa.text('ctid >= CAST(:lower AS tid)').bindparams(
+                    lower=lower)
+            stmts.append(sqlstmt.where(where))
+        return stmts
+
+    def __copy_sql(self, sqlstmt, library, table, index_col=None,
+                   date_cols=None):
+        """
+        Internal function reading a get_table() statement with COPY.
+
+        The rows are parsed by the C CSV reader instead of being built
+          into Python row tuples first.
+        CSV carries no types, so text columns are read as strings to keep
+          e.g. leading zeros in identifiers, booleans are mapped from
+          Postgres' t and f, and pandas infers the rest.
+        NULL is written as \\N, so only it becomes NaN
+          and empty strings stay empty strings.
+        """
+        sql = str(sqlstmt.compile(dialect=self.engine.dialect,
+                                  compile_kwargs={'literal_binds': True}))
+        dtype = {}
+        booleans = False
+        table_info = self.__reflect_schema(library).get(table)
+        if table_info is not None:
+            for name, coltype in zip(table_info['name'], table_info['type']):
+                if coltype.startswith(('character', 'text')):
+                    dtype[name] = str
+                elif coltype == 'boolean':
+                    booleans = True
+        buf = io.BytesIO()
+        self.__ensure_connected()
+        raw = self.engine.raw_connection()
+        try:
+            cursor = raw.cursor()
+            cursor.copy_expert(
+                "COPY ({}) TO STDOUT WITH (FORMAT CSV, HEADER, NULL '\\N')"
+                .format(sql), buf)
+        finally:
+            raw.close()
+        buf.seek(0)
+        return pd.read_csv(
+            buf,
+            dtype=dtype,
+            keep_default_na=False,
+            na_values=['\\N'],
+            true_values=['t'] if booleans else None,
+            false_values=['f'] if booleans else None,
+            parse_dates=list(date_cols) if date_cols else False,
+            index_col=index_col)
+
+    def get_tables(self, library, tables, max_workers=None, **kwargs):
+        """
+            Creates data frames from several tables in the same library,
+              pulling them in parallel over the connection pool.
+
+            :param library: Postgres schema name.
+            :param tables: list or tuple of Postgres table names.
+            :param max_workers: (optional) int, default: None
+                Number of tables to pull at once.
+                Defaults to the connection pool size.
+
+            Any other keyword arguments are passed to get_table(),
+              which always streams here, since the pulls cannot share
+              the session connection.
+
+            :rtype: dict of table name to pandas.DataFrame
+
+            Usage ::
+            >>> data = db.get_tables('crsp', ['msf', 'msenames'], obs=1000)
+            >>> data['msf'].head()
+        """
+        tables = list(tables)
+        if not tables:
+            return {}
+        # Connect and load permissions up front rather than in every thread,
+        #  and the column types too if the threads will need them.
+        self.__ensure_connected()
+        self.__check_schema_perms(library)
+        if kwargs.get('method') == 'copy':
+            self.__reflect_schema(library)
+        kwargs['stream'] = True
+        if max_workers is None:
+            max_workers = self._engine_kwargs['pool_size']
+        max_workers = max(1, min(len(tables), max_workers))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as ex:
+            frames = ex.map(
+                lambda table: self.get_table(library, table, **kwargs), tables)
+            return dict(zip(tables, frames))
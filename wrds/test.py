@@ -6,7 +6,11 @@ try:
     import unittest.mock as mock
 except ImportError:
     import mock
+import os
+import shutil
 import sys
+import tempfile
+from sqlalchemy import exc as sa_exc
 
 
 class TestInitMethod(unittest.TestCase):
@@ -25,7 +29,11 @@ class TestInitMethod(unittest.TestCase):
             connstring,
             connect_args={'sslmode': 'require',
                           'application_name': wrds.sql.appname},
-            isolation_level='AUTOCOMMIT')
+            isolation_level='AUTOCOMMIT',
+            pool_pre_ping=True,
+            pool_size=wrds.sql.WRDS_POOL_SIZE,
+            max_overflow=wrds.sql.WRDS_MAX_OVERFLOW,
+            pool_recycle=wrds.sql.WRDS_POOL_RECYCLE)
 
     @mock.patch('wrds.sql.sa')
     def test_init_calls_sqlalchemy_create_engine_custom(self, mock_sa):
@@ -41,7 +49,11 @@ class TestInitMethod(unittest.TestCase):
             connstring,
             connect_args={'sslmode': 'require',
                           'application_name': wrds.sql.appname},
-            isolation_level='AUTOCOMMIT')
+            isolation_level='AUTOCOMMIT',
+            pool_pre_ping=True,
+            pool_size=wrds.sql.WRDS_POOL_SIZE,
+            max_overflow=wrds.sql.WRDS_MAX_OVERFLOW,
+            pool_recycle=wrds.sql.WRDS_POOL_RECYCLE)
 
     @mock.patch('wrds.sql.Connection.load_library_list')
     @mock.patch('wrds.sql.Connection.connect')
@@ -54,11 +66,25 @@ class TestInitMethod(unittest.TestCase):
         wrds.Connection(autoconnect=False)
         mock_connect.assert_not_called()
 
+    @mock.patch('wrds.sql.sa')
+    def test_init_custom_pool_size(self, mock_sa):
+        wrds.Connection(autoconnect=False, wrds_pool_size=2, wrds_max_overflow=0)
+        kwargs = mock_sa.create_engine.call_args[1]
+        self.assertEqual(kwargs['pool_size'], 2)
+        self.assertEqual(kwargs['max_overflow'], 0)
+
+    @mock.patch('wrds.sql.pd')
+    @mock.patch('wrds.sql.Connection.connect')
+    def test_autoconnect_false_connects_on_first_query(self, mock_connect, mock_pd):
+        t = wrds.Connection(autoconnect=False)
+        t.raw_sql('SELECT 1', chunksize=None)
+        mock_connect.assert_called_once()
+
     @mock.patch('wrds.sql.Connection.connect')
     @mock.patch('wrds.sql.Connection.load_library_list')
-    def test_init_default_load_library_list(self, mock_lll, mock_connect):
+    def test_init_default_no_load_library_list(self, mock_lll, mock_connect):
         wrds.Connection()
-        mock_lll.assert_called_once()
+        mock_lll.assert_not_called()
 
     @mock.patch('wrds.sql.Connection.connect')
     @mock.patch('wrds.sql.Connection.load_library_list')
@@ -70,9 +96,8 @@ class TestInitMethod(unittest.TestCase):
 class TestConnectMethod(unittest.TestCase):
     """ Test the wrds.Connection.connect method.
 
-        Since all exceptions are caught immediately,
-        I'm just not smart enough to simulate bad passwords with
-        the code as written.
+        Only OperationalError, e.g. a missing or bad password,
+        triggers the retry with user credentials.
     """
 
     def setUp(self):
@@ -91,29 +116,57 @@ class TestConnectMethod(unittest.TestCase):
         self.t.engine.connect.assert_called_once()
 
     @mock.patch('wrds.sql.sa')
-    def test_connect_calls_get_user_credentials_on_exception(self, mock_sa):
+    def test_insp_created_lazily_and_reset_on_close(self, mock_sa):
+        self.t.engine = mock.Mock()
+        self.t.connection = mock.Mock()
+        mock_sa.inspect.assert_not_called()
+        self.assertIs(self.t.insp, mock_sa.inspect.return_value)
+        self.t.insp
+        mock_sa.inspect.assert_called_once_with(self.t.connection)
+        self.t.close()
+        self.assertIsNone(self.t.connection)
+        self.assertIsNone(self.t._insp)
+
+    def fail_connect(self, mock_sa):
+        mock_sa.exc = sa_exc
         self.t.engine = mock.Mock()
-        self.t.engine.connect.side_effect = Exception('Fake exception for testing')
+        self.t.engine.connect.side_effect = sa_exc.OperationalError(
+            None, None, Exception('Fake exception for testing'))
+
+    @mock.patch('wrds.sql.sa')
+    def test_connect_calls_get_user_credentials_on_exception(self, mock_sa):
+        self.fail_connect(mock_sa)
+        self.t._password = None
         self.t.connect()
         self.t._Connection__get_user_credentials.assert_called_once()
 
     @mock.patch('wrds.sql.sa')
-    def test_connect_calls_sqlalchemy_create_engine_on_exception(self, mock_sa):
+    def test_connect_other_errors_not_retried(self, mock_sa):
+        mock_sa.exc = sa_exc
         self.t.engine = mock.Mock()
-        self.t.engine.connect.side_effect = Exception('Fake exception for testing')
-        connstring = 'postgresql://{usr}:{pwd}@{host}:{port}/{dbname}'
-        connstring = connstring.format(
-            usr=self.t._username,
-            pwd=self.t._password,
-            host=self.t._hostname,
-            port=self.t._port,
-            dbname=self.t._dbname)
+        self.t.engine.connect.side_effect = ValueError('Fake exception for testing')
+        with self.assertRaises(ValueError):
+            self.t.connect()
+        self.t._Connection__get_user_credentials.assert_not_called()
+        mock_sa.create_engine.assert_not_called()
+
+    @mock.patch('wrds.sql.sa')
+    def test_connect_calls_sqlalchemy_create_engine_on_exception(self, mock_sa):
+        self.fail_connect(mock_sa)
+        old_engine = self.t.engine
         self.t.connect()
+        old_engine.url.set.assert_called_once_with(
+            username=self.t._username, password=self.t._password)
+        old_engine.dispose.assert_called_once()
         mock_sa.create_engine.assert_called_with(
-            connstring,
+            old_engine.url.set.return_value,
             connect_args={'sslmode': 'require',
                           'application_name': wrds.sql.appname},
-        isolation_level='AUTOCOMMIT')
+            isolation_level='AUTOCOMMIT',
+            pool_pre_ping=True,
+            pool_size=wrds.sql.WRDS_POOL_SIZE,
+            max_overflow=wrds.sql.WRDS_MAX_OVERFLOW,
+            pool_recycle=wrds.sql.WRDS_POOL_RECYCLE)
 
 
 class TestRawSqlMethod(unittest.TestCase):
@@ -140,13 +193,14 @@ class TestRawSqlMethod(unittest.TestCase):
     @mock.patch('wrds.sql.pd')
     def test_rawsql_takes_unparameterized_sql(self, mock_pd, mock_sa):
         sql = "SELECT * FROM information_schema.tables LIMIT 1"
-        self.t.raw_sql(sql)
+        self.t.raw_sql(sql, chunksize=None)
         mock_pd.read_sql_query.assert_called_once_with(
             sql,
             self.t.connection,
             coerce_float=True,
             index_col=None,
             parse_dates=None,
+            chunksize=None,
             params=None,
         )
 
@@ -156,16 +210,543 @@ class TestRawSqlMethod(unittest.TestCase):
         sql = "SELECT * FROM information_schema.tables where table_name = %(tablename)s LIMIT 1"
         tablename = "pg_stat_activity"
         self.t.engine = mock.Mock()
-        self.t.raw_sql(sql, params=tablename)
+        self.t.raw_sql(sql, params=tablename, chunksize=None)
         mock_pd.read_sql_query.assert_called_once_with(
             sql,
             self.t.connection,
             coerce_float=True,
             index_col=None,
             parse_dates=None,
+            chunksize=None,
             params=tablename,
         )
 
+    @mock.patch('wrds.sql.pd.read_sql_query')
+    def test_rawsql_stream_reads_from_pooled_connection(self, mock_rsq):
+        self.t.engine = mock.MagicMock()
+        sql = "SELECT * FROM information_schema.tables"
+        mock_rsq.return_value = iter([
+            wrds.sql.pd.DataFrame({'a': [1, 2]}),
+            wrds.sql.pd.DataFrame({'a': [3]})])
+        df = self.t.raw_sql(sql, chunksize=2, stream=True)
+        self.assertEqual(list(df['a']), [1, 2, 3])
+        conn = self.t.engine.connect.return_value.__enter__.return_value
+        conn.execution_options.assert_called_once_with(
+            isolation_level='READ COMMITTED', stream_results=True)
+        mock_rsq.assert_called_once_with(
+            sql,
+            conn.execution_options.return_value,
+            coerce_float=True,
+            index_col=None,
+            parse_dates=None,
+            chunksize=2,
+            params=None,
+        )
+        self.t.connection.execute.assert_not_called()
+
+    @mock.patch('wrds.sql.pd.read_sql_query')
+    def test_rawsql_return_iter_is_lazy(self, mock_rsq):
+        self.t.engine = mock.MagicMock()
+        chunks = self.t.raw_sql("SELECT 1", chunksize=2, return_iter=True,
+                                stream=True)
+        self.t.engine.connect.assert_not_called()
+        list(chunks)
+        self.t.engine.connect.assert_called_once()
+
+    @mock.patch('wrds.sql.pd.read_sql_query')
+    def test_rawsql_chunksize_uses_session_connection(self, mock_rsq):
+        sql = "EXPLAIN SELECT 1"
+        mock_rsq.return_value = iter([
+            wrds.sql.pd.DataFrame({'a': [1, 2]}),
+            wrds.sql.pd.DataFrame({'a': [3]})])
+        df = self.t.raw_sql(sql, chunksize=2)
+        self.assertEqual(list(df['a']), [1, 2, 3])
+        mock_rsq.assert_called_once_with(
+            sql,
+            self.t.connection,
+            coerce_float=True,
+            index_col=None,
+            parse_dates=None,
+            chunksize=2,
+            params=None,
+        )
+        self.t.engine.connect.assert_not_called()
+
+    @mock.patch('wrds.sql.pd.read_sql_query')
+    def test_rawsql_chunksize_empty_result(self, mock_rsq):
+        mock_rsq.return_value = iter([])
+        df = self.t.raw_sql("SELECT 1 WHERE false", chunksize=2)
+        self.assertTrue(df.empty)
+
+
+class TestSchemaPermCache(unittest.TestCase):
+    """ Test the lazily loaded, disk-cached wrds.Connection.schema_perm. """
+
+    def setUp(self):
+        self.homedir = tempfile.mkdtemp()
+        patcher = mock.patch('wrds.sql.os.path.expanduser',
+                             return_value=self.homedir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(shutil.rmtree, self.homedir)
+        self.t = wrds.Connection(autoconnect=False,
+                                 wrds_username='faketestusername')
+        self.t.connection = mock.Mock()
+        self.t.connection.execute.return_value = [
+            ('crsp',), ('comp',)]
+
+    def test_schema_perm_loads_on_first_access_only(self):
+        self.t.list_libraries().remove('crsp')
+        self.assertEqual(self.t.schema_perm, ['crsp', 'comp'])
+        self.t.connection.execute.assert_called_once()
+
+    def test_schema_perm_written_to_cache_file(self):
+        self.t.schema_perm
+        cachefile = os.path.join(self.homedir, wrds.sql.WRDS_SCHEMA_CACHE_FILE)
+        self.assertTrue(os.path.isfile(cachefile))
+        self.assertEqual(os.stat(cachefile).st_mode & 0o777, 0o600)
+
+    def test_schema_perm_read_from_cache_file(self):
+        self.t.schema_perm
+        t = wrds.Connection(autoconnect=False, wrds_username='faketestusername')
+        t.connection = mock.Mock()
+        self.assertEqual(t.schema_perm, ['crsp', 'comp'])
+        t.connection.execute.assert_not_called()
+
+    def test_schema_perm_cache_not_shared_between_users(self):
+        self.t.schema_perm
+        t = wrds.Connection(autoconnect=False, wrds_username='otheruser')
+        t.connection = mock.Mock()
+        t.connection.execute.return_value = [('crsp',)]
+        self.assertEqual(t.schema_perm, ['crsp'])
+
+    def test_check_schema_perms_caches_all_schemas(self):
+        self.t._insp = mock.Mock()
+        self.t._insp.get_schema_names.return_value = ['crsp', 'comp', 'taq']
+        for _ in range(2):
+            with self.assertRaises(wrds.sql.NotSubscribedError):
+                self.t.list_tables('taq')
+        with self.assertRaises(wrds.sql.SchemaNotFoundError):
+            self.t.list_tables('nosuchlib')
+        self.t._insp.get_schema_names.assert_called_once()
+
+    def test_check_schema_perms_refreshes_cached_lists_on_miss(self):
+        self.t._insp = mock.Mock()
+        self.t._insp.get_schema_names.return_value = ['crsp', 'comp', 'taq']
+        self.t.list_tables('crsp')
+        self.t._Connection__get_all_schemas()
+        t = wrds.Connection(autoconnect=False, wrds_username='faketestusername')
+        t.connection = mock.Mock()
+        t.connection.execute.return_value = [('crsp',), ('comp',)]
+        t._insp = mock.Mock()
+        t._insp.get_schema_names.return_value = ['crsp', 'comp', 'taq', 'new']
+        with self.assertRaises(wrds.sql.NotSubscribedError):
+            t.list_tables('new')
+        t.connection.execute.assert_called_once()
+        t._insp.get_schema_names.assert_called_once()
+        with self.assertRaises(wrds.sql.SchemaNotFoundError):
+            t.list_tables('nosuchlib')
+        t.connection.execute.assert_called_once()
+
+    def test_schema_perm_stale_cache_ignored(self):
+        self.t.schema_perm
+        t = wrds.Connection(autoconnect=False, wrds_username='faketestusername',
+                            wrds_schema_cache_ttl=1)
+        t.connection = mock.Mock()
+        t.connection.execute.return_value = [('crsp',)]
+        with mock.patch('wrds.sql.time.time', return_value=2e10):
+            self.assertEqual(t.schema_perm, ['crsp'])
+
+
+class TestListTablesMethod(unittest.TestCase):
+    """ Test the wrds.Connection.list_tables method. """
+
+    def setUp(self):
+        self.homedir = tempfile.mkdtemp()
+        patcher = mock.patch('wrds.sql.os.path.expanduser',
+                             return_value=self.homedir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(shutil.rmtree, self.homedir)
+        self.t = wrds.Connection(autoconnect=False)
+        self.t._schema_perm = ['wrdssec']
+        self.t.connection = mock.Mock()
+        self.t.connection.execute.return_value = [('dforms',), ('wrds_forms',)]
+
+    def test_list_tables_queries_once(self):
+        self.t.list_tables('wrdssec').remove('dforms')
+        self.assertEqual(self.t.list_tables('wrdssec'), ['dforms', 'wrds_forms'])
+        self.t.connection.execute.assert_called_once()
+
+    def test_list_tables_read_from_cache_file(self):
+        self.t.list_tables('wrdssec')
+        t = wrds.Connection(autoconnect=False)
+        t._schema_perm = ['wrdssec']
+        t.connection = mock.Mock()
+        self.assertEqual(t.list_tables('wrdssec'), ['dforms', 'wrds_forms'])
+        t.connection.execute.assert_not_called()
+
+
+class TestGetRowCountMethod(unittest.TestCase):
+    """ Test the wrds.Connection.get_row_count method. """
+
+    def setUp(self):
+        self.t = wrds.Connection(autoconnect=False)
+        self.t.connection = mock.Mock()
+
+    def test_get_row_count_uses_statistics(self):
+        self.t.connection.execute.return_value.fetchone.return_value = (16378400,)
+        self.assertEqual(self.t.get_row_count('wrdssec', 'dforms'), 16378400)
+        self.t.connection.execute.assert_called_once()
+
+    def test_get_row_count_falls_back_to_explain(self):
+        self.t.connection.execute.return_value.fetchone.side_effect = [
+            None, ([{'Plan': {'Plan Rows': 42}}],)]
+        self.assertEqual(self.t.get_row_count('wrdssec', 'dforms'), 42)
+        self.assertIn('EXPLAIN', self.t.connection.execute.call_args[0][0])
+
+    def test_get_row_count_is_cached(self):
+        self.t.connection.execute.return_value.fetchone.return_value = (10,)
+        self.t.get_row_count('wrdssec', 'dforms')
+        self.assertEqual(self.t.get_row_count('wrdssec', 'dforms'), 10)
+        self.t.connection.execute.assert_called_once()
+        with mock.patch('wrds.sql.time.time', return_value=2e10):
+            self.t.get_row_count('wrdssec', 'dforms')
+        self.assertEqual(self.t.connection.execute.call_count, 2)
+
+
+class TestDescribeTableMethod(unittest.TestCase):
+    """ Test the wrds.Connection.describe_table method. """
+
+    def setUp(self):
+        self.t = wrds.Connection(autoconnect=False)
+        self.t.connection = mock.Mock()
+        self.t.get_row_count = mock.Mock(return_value=0)
+        self.columns = wrds.sql.pd.DataFrame({
+            'table_name': ['dforms', 'dforms', 'wrds_forms'],
+            'name': ['cik', 'fdate', 'cik'],
+            'nullable': [True, True, False],
+            'type': ['character varying', 'date', 'character varying'],
+            'comment': [None, None, None]})
+
+    @mock.patch('wrds.sql.pd.read_sql_query')
+    def test_describe_table_returns_columns(self, mock_rsq):
+        mock_rsq.return_value = self.columns
+        info = self.t.describe_table('wrdssec', 'dforms')
+        self.assertEqual(list(info.columns), ['name', 'nullable', 'type', 'comment'])
+        self.assertEqual(list(info['name']), ['cik', 'fdate'])
+
+    @mock.patch('wrds.sql.pd.read_sql_query')
+    def test_describe_table_reflects_schema_once(self, mock_rsq):
+        mock_rsq.return_value = self.columns
+        self.t.describe_table('wrdssec', 'dforms')
+        self.t.describe_table('wrdssec', 'wrds_forms')
+        mock_rsq.assert_called_once()
+
+
+class TestGetSchemaForViewMethod(unittest.TestCase):
+    """ Test the wrds.Connection.__get_schema_for_view method. """
+
+    def setUp(self):
+        self.t = wrds.Connection(autoconnect=False)
+        self.t._schema_perm = ['crsp']
+        self.t.connection = mock.Mock()
+        self.t.connection.execute.return_value.fetchall.return_value = [
+            ('dsf', 'crsp_a_stock'), ('msf', 'crsp_a_stock')]
+
+    def test_get_schema_for_view_resolves_all_views_once(self):
+        get_schema = self.t._Connection__get_schema_for_view
+        self.assertEqual(get_schema('crsp', 'dsf'), 'crsp_a_stock')
+        self.assertEqual(get_schema('crsp', 'msf'), 'crsp_a_stock')
+        self.assertIsNone(get_schema('crsp', 'notaview'))
+        self.t.connection.execute.assert_called_once()
+
+
+class TestGetTableMethod(unittest.TestCase):
+    """ Test the SQL built by the wrds.Connection.get_table method. """
+
+    def setUp(self):
+        self.t = wrds.Connection(autoconnect=False)
+        self.t._schema_perm = ['wrdssec']
+        self.t.raw_sql = mock.Mock()
+
+    def sql(self):
+        from sqlalchemy.dialects import postgresql
+        stmt = self.t.raw_sql.call_args[0][0]
+        return ' '.join(str(stmt.compile(
+            dialect=postgresql.dialect(),
+            compile_kwargs={'literal_binds': True})).split())
+
+    def test_get_table_full_table_has_no_limit_or_offset(self):
+        self.t.get_table('wrdssec', 'dforms')
+        self.assertEqual(self.sql(), 'SELECT * FROM wrdssec.dforms')
+
+    def test_get_table_obs_and_offset(self):
+        self.t.get_table('wrdssec', 'dforms', obs=10, offset=5)
+        self.assertEqual(self.sql(),
+                         'SELECT * FROM wrdssec.dforms LIMIT 10 OFFSET 5')
+
+    def test_get_table_copy_method(self):
+        self.t.raw_sql = mock.Mock()
+        self.t.connection = mock.Mock()
+        self.t._col_cache['wrdssec'] = {'dforms': wrds.sql.pd.DataFrame({
+            'name': ['cik', 'fdate', 'coname', 'amended'],
+            'type': ['character varying(10)', 'date', 'text', 'boolean']})}
+        from sqlalchemy.dialects import postgresql
+        self.t.engine = mock.Mock()
+        self.t.engine.dialect = postgresql.dialect()
+        cursor = self.t.engine.raw_connection.return_value.cursor.return_value
+        cursor.copy_expert.side_effect = lambda sql, buf: buf.write(
+            b'cik,fdate,coname,amended\n'
+            b'0000000003,1995-02-15,"",t\n'
+            b'0000000004,\\N,\\N,f\n')
+        df = self.t.get_table('wrdssec', 'dforms', obs=2, method='copy',
+                              date_cols=['fdate'])
+        sql = ' '.join(cursor.copy_expert.call_args[0][0].split())
+        self.assertEqual(sql, "COPY (SELECT * FROM wrdssec.dforms LIMIT 2) "
+                              "TO STDOUT WITH (FORMAT CSV, HEADER, NULL '\\N')")
+        self.assertEqual(df['cik'][0], '0000000003')
+        self.assertEqual(str(df['fdate'][0].date()), '1995-02-15')
+        self.assertEqual(df['coname'][0], '')
+        self.assertTrue(wrds.sql.pd.isna(df['coname'][1]))
+        self.assertEqual(list(df['amended']), [True, False])
+        self.t.raw_sql.assert_not_called()
+        self.t.engine.raw_connection.return_value.close.assert_called_once()
+
+    def test_get_table_streams_only_large_pulls(self):
+        self.t.get_table('wrdssec', 'dforms', obs=10)
+        self.assertFalse(self.t.raw_sql.call_args[1]['stream'])
+        self.t.get_table('wrdssec', 'dforms')
+        self.assertTrue(self.t.raw_sql.call_args[1]['stream'])
+        self.t.get_table('wrdssec', 'dforms', obs=10, stream=True)
+        self.assertTrue(self.t.raw_sql.call_args[1]['stream'])
+
+    def test_get_table_reuses_statement_for_same_shape(self):
+        self.t.get_table('wrdssec', 'dforms', columns=['cik'], obs=10)
+        self.t.get_table('wrdssec', 'dforms', columns=('CIK',), obs=20)
+        self.assertEqual(self.sql(), 'SELECT cik FROM wrdssec.dforms LIMIT 20')
+        self.assertIs(
+            wrds.sql._get_table_select('wrdssec', 'dforms', ('cik',)),
+            wrds.sql._get_table_select('wrdssec', 'dforms', ('cik',)))
+
+    def pages(self, row):
+        self.t.connection = mock.Mock()
+        self.t.engine = mock.MagicMock()
+        conn = self.t.engine.connect.return_value.__enter__.return_value
+        conn.execute.return_value.fetchone.return_value = row
+
+    def test_get_table_parallel_splits_by_ctid(self):
+        self.pages((10,))
+        self.t.raw_sql.side_effect = lambda stmt, **kw: wrds.sql.pd.DataFrame(
+            {'sql': [' '.join(str(stmt.compile(
+                compile_kwargs={'literal_binds': True})).split())]})
+        df = self.t.get_table('wrdssec', 'dforms', parallel=3)
+        self.assertEqual(list(df['sql']), [
+            "SELECT * FROM wrdssec.dforms WHERE ctid >= CAST('(0,0)' AS tid) "
+            "AND ctid < CAST('(4,0)' AS tid)",
+            "SELECT * FROM wrdssec.dforms WHERE ctid >= CAST('(4,0)' AS tid) "
+            "AND ctid < CAST('(8,0)' AS tid)",
+            "SELECT * FROM wrdssec.dforms WHERE ctid >= CAST('(8,0)' AS tid)"])
+        self.t.connection.execute.assert_not_called()
+
+    def test_get_table_parallel_index_matches_single_pull(self):
+        pd = wrds.sql.pd
+        self.pages((10,))
+        self.t.raw_sql.side_effect = lambda stmt, **kw: pd.DataFrame(
+            {'a': [1, 2]})
+        df = self.t.get_table('wrdssec', 'dforms', parallel=3)
+        # What a single pull of the six rows returns
+        self.assertTrue(df.index.equals(pd.RangeIndex(6)))
+        self.t.raw_sql.side_effect = lambda stmt, **kw: pd.DataFrame(
+            {'a': [1, 2]}).set_index('a')
+        df = self.t.get_table('wrdssec', 'dforms', parallel=3, index_col='a')
+        self.assertEqual(list(df.index), [1, 2, 1, 2, 1, 2])
+
+    def test_get_table_parallel_pulls_views_whole(self):
+        self.pages(None)
+        self.t.get_table('wrdssec', 'dforms', parallel=3)
+        self.t.raw_sql.assert_called_once()
+        self.assertEqual(self.sql(), 'SELECT * FROM wrdssec.dforms')
+
+    def test_get_table_parallel_pulls_share_pool_slots(self):
+        import threading
+        import time
+        self.t._pool_slots = threading.BoundedSemaphore(2)
+        self.pages((10,))
+        lock = threading.Lock()
+        running = [0, 0]
+
+        def raw_sql(stmt, **kwargs):
+            with lock:
+                running[0] += 1
+                running[1] = max(running)
+            time.sleep(0.01)
+            with lock:
+                running[0] -= 1
+            return wrds.sql.pd.DataFrame()
+        self.t.raw_sql.side_effect = raw_sql
+        self.t.get_tables('wrdssec', ['dforms', 'wforms'], parallel=4)
+        self.assertEqual(self.t.raw_sql.call_count, 8)
+        self.assertEqual(running[1], 2)
+
+    def test_get_table_quotes_columns(self):
+        self.t.get_table('wrdssec', 'dforms', columns=['CIK', 'order'])
+        self.assertEqual(self.sql(),
+                         'SELECT cik, "order" FROM wrdssec.dforms')
+
+
+class TestGetTablesMethod(unittest.TestCase):
+    """ Test the wrds.Connection.get_tables method. """
+
+    def setUp(self):
+        # Keep the failed permission check out of the real schema cache.
+        self.t = wrds.Connection(autoconnect=False, wrds_schema_cache_ttl=0)
+        self.t._schema_perm = ['crsp']
+        self.t.connection = mock.Mock()
+        self.t.get_table = mock.Mock(side_effect=lambda lib, tbl, **kw: tbl.upper())
+
+    def test_get_tables_returns_dict_in_order(self):
+        data = self.t.get_tables('crsp', ['msf', 'dsf', 'msenames'], obs=10)
+        self.assertEqual(list(data.items()),
+                         [('msf', 'MSF'), ('dsf', 'DSF'), ('msenames', 'MSENAMES')])
+        self.t.get_table.assert_any_call('crsp', 'dsf', obs=10, stream=True)
+
+    def test_get_tables_copy_reflects_schema_up_front(self):
+        reflect = mock.Mock()
+        self.t._Connection__reflect_schema = reflect
+        self.t.get_table.side_effect = lambda lib, tbl, **kw: reflect.call_count
+        data = self.t.get_tables('crsp', ['msf', 'dsf'], method='copy')
+        self.assertEqual(data, {'msf': 1, 'dsf': 1})
+
+    def test_get_tables_checks_permissions(self):
+        self.t._insp = mock.Mock()
+        self.t._insp.get_schema_names.return_value = []
+        with self.assertRaises(wrds.sql.SchemaNotFoundError):
+            self.t.get_tables('comp', ['funda'])
+        self.t.get_table.assert_not_called()
+
+
+class TestRawSqlResultCache(unittest.TestCase):
+    """ Test the opt-in on-disk result cache of wrds.Connection.raw_sql. """
+
+    def setUp(self):
+        self.cachedir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cachedir)
+        self.t = wrds.Connection(autoconnect=False, wrds_cache_dir=self.cachedir)
+        self.t.connection = mock.Mock()
+        self.df = wrds.sql.pd.DataFrame({'a': [1, 2]})
+
+        def to_parquet(df, path):
+            open(path, 'w').close()
+        patcher = mock.patch('wrds.sql.pd.DataFrame.to_parquet', to_parquet)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @mock.patch('wrds.sql.pd.read_parquet')
+    @mock.patch('wrds.sql.pd.read_sql_query')
+    def test_rawsql_repeated_query_read_from_cache(self, mock_rsq, mock_rp):
+        mock_rsq.return_value = self.df
+        mock_rp.return_value = self.df
+        self.t.raw_sql("SELECT a\nFROM  t", chunksize=None)
+        self.assertIs(self.t.raw_sql("SELECT a FROM t", chunksize=None), self.df)
+        mock_rsq.assert_called_once()
+        mock_rp.assert_called_once()
+
+    @mock.patch('wrds.sql.pd.read_parquet')
+    @mock.patch('wrds.sql.pd.read_sql_query')
+    def test_rawsql_cache_keyed_on_arguments(self, mock_rsq, mock_rp):
+        mock_rsq.return_value = self.df
+        self.t.raw_sql("SELECT a FROM t WHERE b = 'X'", chunksize=None)
+        self.t.raw_sql("SELECT a FROM t WHERE b = 'x'", chunksize=None)
+        self.t.raw_sql("SELECT a FROM t WHERE b = 'x'", chunksize=None,
+                       index_col='a')
+        self.assertEqual(mock_rsq.call_count, 3)
+        mock_rp.assert_not_called()
+
+    @mock.patch('wrds.sql.pd.read_sql_query')
+    def test_rawsql_failed_cache_write_keeps_result(self, mock_rsq):
+        mock_rsq.return_value = self.df
+        with mock.patch('wrds.sql.pd.DataFrame.to_parquet',
+                        side_effect=NotImplementedError('Fake exception for testing')):
+            self.assertIs(self.t.raw_sql("SELECT a FROM t", chunksize=None),
+                          self.df)
+        self.assertEqual(os.listdir(self.cachedir), [])
+
+    @mock.patch('wrds.sql.pd.read_parquet')
+    @mock.patch('wrds.sql.pd.read_sql_query')
+    def test_rawsql_stale_cache_ignored(self, mock_rsq, mock_rp):
+        mock_rsq.return_value = self.df
+        self.t.raw_sql("SELECT a FROM t", chunksize=None)
+        with mock.patch('wrds.sql.time.time', return_value=2e10):
+            self.t.raw_sql("SELECT a FROM t", chunksize=None)
+        self.assertEqual(mock_rsq.call_count, 2)
+        mock_rp.assert_not_called()
+
+
+class TestGetTableResultCache(unittest.TestCase):
+    """ Test get_table pulls answered from a containing cached pull. """
+
+    def setUp(self):
+        from sqlalchemy.dialects import postgresql
+        self.cachedir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cachedir)
+        self.t = wrds.Connection(autoconnect=False, wrds_cache_dir=self.cachedir)
+        self.t._schema_perm = ['wrdssec']
+        self.t.connection = mock.Mock()
+        self.t.engine = mock.MagicMock()
+        self.t.engine.dialect = postgresql.dialect()
+        pd = wrds.sql.pd
+        self.df = pd.DataFrame({'a': range(100), 'b': range(100), 'c': range(100)})
+
+        def to_parquet(df, path):
+            df.to_pickle(path)
+
+        def read_parquet(path, columns=None):
+            df = pd.read_pickle(path)
+            return df if columns is None else df[columns]
+        for name, fake in (('wrds.sql.pd.DataFrame.to_parquet', to_parquet),
+                           ('wrds.sql.pd.read_parquet', read_parquet)):
+            patcher = mock.patch(name, fake)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def pull(self, df, **kwargs):
+        with mock.patch('wrds.sql.pd.read_sql_query',
+                        return_value=iter([df])) as mock_rsq:
+            result = self.t.get_table('wrdssec', 'dforms', **kwargs)
+        return result, mock_rsq.call_count
+
+    def test_get_table_subset_served_from_cache(self):
+        self.pull(self.df.iloc[10:60], columns=['a', 'b', 'c'], obs=50, offset=10)
+        df, queries = self.pull(None, columns=['b', 'a'], obs=20, offset=30)
+        self.assertEqual(queries, 0)
+        self.assertEqual(list(df.columns), ['b', 'a'])
+        self.assertEqual(list(df['a']), list(range(30, 50)))
+
+    def test_get_table_rows_outside_cache_queried(self):
+        self.pull(self.df.iloc[:50], obs=50)
+        _, queries = self.pull(self.df.iloc[40:60], obs=20, offset=40)
+        self.assertEqual(queries, 1)
+
+    def test_get_table_columns_outside_cache_queried(self):
+        self.pull(self.df[['a']], columns=['a'])
+        _, queries = self.pull(self.df[['a', 'b']], columns=['a', 'b'], obs=5)
+        self.assertEqual(queries, 1)
+
+    def test_get_table_pull_cache_index_is_bounded(self):
+        for offset in range(wrds.sql.WRDS_PULL_CACHE_ENTRIES + 2):
+            self.pull(self.df.iloc[offset:offset + 1], obs=1, offset=offset)
+        entries, = self.t._pull_cache_index.values()
+        self.assertEqual(len(entries), wrds.sql.WRDS_PULL_CACHE_ENTRIES)
+        self.assertEqual(entries[0]['offset'],
+                         wrds.sql.WRDS_PULL_CACHE_ENTRIES + 1)
+
+    def test_get_table_short_pull_covers_rest_of_table(self):
+        self.pull(self.df, obs=500)
+        df, queries = self.pull(None, offset=90)
+        self.assertEqual(queries, 0)
+        self.assertEqual(list(df['a']), list(range(90, 100)))
+
 
 class TestCreatePgpassFile(unittest.TestCase):
     def setUp(self):
@@ -196,5 +777,92 @@ class TestCreatePgpassFile(unittest.TestCase):
         self.t._Connection__create_pgpass_file_unix.assert_called_once()
 
 
+class TestWritePgpassFile(unittest.TestCase):
+    """ Test the wrds.Connection.__write_pgpass_file method. """
+
+    def setUp(self):
+        self.t = wrds.Connection(autoconnect=False)
+        self.t._hostname = 'wrds.test.private'
+        self.t._port = 12345
+        self.t._dbname = 'testdbname'
+        self.t._username = 'faketestusername'
+        self.t._password = 'fake:testpass'
+        fd, self.pgfile = tempfile.mkstemp()
+        os.close(fd)
+        self.addCleanup(os.remove, self.pgfile)
+
+    def write(self, text):
+        with open(self.pgfile, 'w') as fd:
+            fd.write(text)
+
+    def read(self):
+        with open(self.pgfile, 'r') as fd:
+            return fd.read()
+
+    def test_write_pgpass_replaces_matching_entry(self):
+        self.write('other.host:5432:db:user:pass\n'
+                   'wrds.test.private:12345:testdbname:faketestusername:old\n')
+        self.t._Connection__write_pgpass_file(self.pgfile)
+        self.assertEqual(
+            self.read(),
+            'other.host:5432:db:user:pass\n'
+            'wrds.test.private:12345:testdbname:faketestusername:fake\\:testpass\n')
+
+    def test_write_pgpass_appends_new_entry(self):
+        self.write('other.host:5432:db:user:pa\\:ss\n')
+        self.t._Connection__write_pgpass_file(self.pgfile)
+        self.assertEqual(
+            self.read(),
+            'other.host:5432:db:user:pa\\:ss\n'
+            'wrds.test.private:12345:testdbname:faketestusername:fake\\:testpass\n')
+
+    def test_write_pgpass_keeps_blank_lines_and_missing_newline(self):
+        self.write('# comment\n\nother.host:5432:db:user:pass')
+        self.t._Connection__write_pgpass_file(self.pgfile)
+        self.assertEqual(
+            self.read(),
+            '# comment\n\nother.host:5432:db:user:pass\n'
+            'wrds.test.private:12345:testdbname:faketestusername:fake\\:testpass\n')
+
+    def test_write_pgpass_creates_file(self):
+        os.remove(self.pgfile)
+        self.t._Connection__write_pgpass_file(self.pgfile)
+        self.assertEqual(
+            self.read(),
+            'wrds.test.private:12345:testdbname:faketestusername:fake\\:testpass\n')
+
+    def test_write_pgpass_skips_write_if_unchanged(self):
+        self.write('other.host:5432:db:user:pass\n'
+                   'wrds.test.private:12345:testdbname:faketestusername:fake\\:testpass\n')
+        with mock.patch('wrds.sql.open', create=True, wraps=open) as mock_open:
+            self.t._Connection__write_pgpass_file(self.pgfile)
+        for call in mock_open.call_args_list:
+            self.assertNotIn('w', call[0][1])
+
+    def test_write_pgpass_failed_read_leaves_no_temp_file(self):
+        self.write('other.host:5432:db:user:pass\n')
+        pgdir = os.path.dirname(self.pgfile)
+        before = set(os.listdir(pgdir))
+
+        def fake_open(path, mode='r', *args):
+            if mode == 'r':
+                raise PermissionError('Fake exception for testing')
+            return open(path, mode, *args)
+        mkstemp = tempfile.mkstemp
+        temps = []
+
+        def fake_mkstemp(**kwargs):
+            temps.append(mkstemp(**kwargs))
+            return temps[-1]
+        with mock.patch('wrds.sql.open', create=True, side_effect=fake_open), \
+                mock.patch('wrds.sql.tempfile.mkstemp', fake_mkstemp):
+            with self.assertRaises(PermissionError):
+                self.t._Connection__write_pgpass_file(self.pgfile)
+        # The temporary file was closed as well as removed.
+        self.assertRaises(OSError, os.fstat, temps[0][0])
+        self.assertEqual(set(os.listdir(pgdir)), before)
+        self.assertEqual(self.read(), 'other.host:5432:db:user:pass\n')
+
+
 if (__name__ == '__main__'):
     unittest.main()